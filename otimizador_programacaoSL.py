@@ -1,135 +1,148 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import re
-from datetime import datetime
 import io # Necessário para manipulação do arquivo em memória
 
 # --- LÓGICA DE NEGÓCIO (Otimização) ---
-# Esta seção permanece idêntica à versão original. É o núcleo do sistema.
+# Núcleo do sistema: agregação por lote, sequenciamento, batches e relatório, tudo vetorizado.
 
-DATA_ATUAL = datetime.now()
+DATA_ATUAL = pd.Timestamp.now().normalize()
 PESO_META_BATCH = 120
+PADRAO_DIMENSOES = re.compile(r'(\d+[\.,]\d+|\d+)\s*X\s*(\d+)')
+NOMES_URGENCIA = {
+    1: "1 - URGENTÍSSIMO", 2: "2 - URGENTE", 3: "3 - ATRASADO", 4: "4 - NO TEMPO", 5: "5 - COM FOLGA"
+}
+CATEGORIAS_URGENCIA = list(NOMES_URGENCIA.values()) + ["5 - COM FOLGA (SEM DATA)"]
+ORDEM_COLUNAS_RELATORIO = [
+    'Posição na Sequência', 'LOTE', 'PC', 'PEDIDO', 'PRODUTO', 'QTDE', 
+    'PREVISÃO', 'OBS.:', 'DT PRODUÇÃO', 'TURNO', 'PESO BOB', 'DATA DE ENTREGA',
+    'SETUP', 'URGENCIA'
+]
+COLUNAS_DERIVADAS = ['Posição na Sequência', 'SETUP', 'URGENCIA']
+# Colunas lidas da planilha: as do relatório que não são calculadas pelo otimizador
+COLUNAS_PLANILHA = {col for col in ORDEM_COLUNAS_RELATORIO if col not in COLUNAS_DERIVADAS}
 
-def parse_dimensoes(descricao_produto):
-    if not isinstance(descricao_produto, str) or "REBAIXAD" in descricao_produto.upper():
-        return None, None
-    match = re.search(r'(\d+[\.,]\d+|\d+)\s*X\s*(\d+)', descricao_produto)
-    if match:
-        try:
-            espessura = float(match.group(1).replace(',', '.'))
-            largura = int(match.group(2))
-            return espessura, largura
-        except (ValueError, IndexError):
-            return None, None
-    return None, None
-
-def determinar_setup(espessura, largura):
-    if espessura is None or largura is None:
-        return "SETUP_INDEFINIDO"
-    plaina = "PLAINA_FINA" if espessura <= 4.75 else "PLAINA_GROSSA"
-    balancim = f"{largura}mm"
-    return f"{plaina}_{balancim}"
-
-def calcular_urgencia(data_entrega, data_atual):
-    if pd.isna(data_entrega):
-        return 5, "5 - COM FOLGA (SEM DATA)"
-    dias_atraso = (data_atual - data_entrega).days
-    if dias_atraso > 10: return 1, "1 - URGENTÍSSIMO"
-    if 5 <= dias_atraso <= 10: return 2, "2 - URGENTE"
-    if 0 <= dias_atraso <= 4: return 3, "3 - ATRASADO"
-    if -10 <= dias_atraso < 0: return 4, "4 - NO TEMPO"
-    return 5, "5 - COM FOLGA"
-
-def processar_dados_lote(df_original):
-    lotes = []
-    for lote_id, grupo in df_original.groupby('LOTE'):
-        qtde_numerica = pd.to_numeric(grupo['QTDE'], errors='coerce').fillna(0)
-        peso_total_lote = qtde_numerica.sum()
-        
-        data_entrega_lote = grupo['DATA DE ENTREGA'].min()
-        espessura_lote, largura_lote = None, None
-        for produto in grupo['PRODUTO']:
-            espessura, largura = parse_dimensoes(produto)
-            if espessura is not None:
-                espessura_lote, largura_lote = espessura, largura
-                break
-        setup_lote = determinar_setup(espessura_lote, largura_lote)
-        urgencia_num, urgencia_nome = calcular_urgencia(data_entrega_lote, DATA_ATUAL)
-        lotes.append({
-            'LOTE': lote_id, 'PESO_TOTAL': peso_total_lote, 'DATA_ENTREGA': data_entrega_lote,
-            'SETUP': setup_lote, 'URGENCIA_NIVEL': urgencia_num, 'URGENCIA_NOME': urgencia_nome,
-            'ESPESSURA': espessura_lote if espessura_lote is not None else 999
-        })
-    return pd.DataFrame(lotes)
+def calcular_nivel_urgencia(dias_atraso):
+    # Vetorizado; dias sem data (NaN) não satisfazem nenhuma faixa e ficam no nível 5
+    dias = np.asarray(dias_atraso, dtype=float)
+    return np.select(
+        [dias > 10, (dias >= 5) & (dias <= 10), (dias >= 0) & (dias <= 4), (dias >= -10) & (dias < 0)],
+        [1, 2, 3, 4], default=5
+    )
+
+def processar_dados_lote(df_original, data_atual):
+    # Extrai espessura/largura de toda a coluna PRODUTO de uma só vez; produtos rebaixados não têm dimensão
+    produtos = df_original['PRODUTO']
+    validos = ~produtos.str.upper().str.contains('REBAIXAD', na=True)
+    dimensoes = produtos[validos].str.extract(PADRAO_DIMENSOES, expand=True)
+    # Trabalha só com as colunas usadas na agregação, sem copiar a planilha inteira
+    df = df_original[['LOTE', 'QTDE', 'DATA DE ENTREGA']].assign(
+        ESPESSURA=dimensoes[0].str.replace(',', '.', regex=False).astype(float),
+        LARGURA=dimensoes[1].astype('Int64'),
+    )
+
+    df['QTDE'] = pd.to_numeric(df['QTDE'], errors='coerce').fillna(0)
+
+    # Uma única agregação por lote; 'first' ignora nulos, então pega o primeiro produto com dimensões válidas
+    lotes = df.groupby('LOTE').agg(
+        PESO_TOTAL=('QTDE', 'sum'),
+        DATA_ENTREGA=('DATA DE ENTREGA', 'min'),
+        ESPESSURA=('ESPESSURA', 'first'),
+        LARGURA=('LARGURA', 'first'),
+    ).reset_index()
+
+    # Setup = plaina (fina até 4,75mm) + largura do balancim; sem dimensões, SETUP_INDEFINIDO
+    plaina = pd.Series(np.where(lotes['ESPESSURA'] <= 4.75, 'PLAINA_FINA_', 'PLAINA_GROSSA_'), index=lotes.index)
+    lotes['SETUP'] = (plaina + lotes['LARGURA'].astype(str) + 'mm').where(lotes['ESPESSURA'].notna(), 'SETUP_INDEFINIDO')
+    # Categorias ordenadas alfabeticamente: ordenar pelos códigos equivale a ordenar pelo texto
+    lotes['SETUP'] = lotes['SETUP'].astype('category')
+
+    dias_atraso = (data_atual - lotes['DATA_ENTREGA']).dt.days
+    lotes['URGENCIA_NIVEL'] = calcular_nivel_urgencia(dias_atraso)
+    lotes['URGENCIA_NOME'] = pd.Categorical(
+        lotes['URGENCIA_NIVEL'].map(NOMES_URGENCIA).where(dias_atraso.notna(), "5 - COM FOLGA (SEM DATA)"),
+        categories=CATEGORIAS_URGENCIA, ordered=True
+    )
+    lotes['ESPESSURA'] = lotes['ESPESSURA'].fillna(999)
+
+    return lotes[['LOTE', 'PESO_TOTAL', 'DATA_ENTREGA', 'SETUP', 'URGENCIA_NIVEL', 'URGENCIA_NOME', 'ESPESSURA']]
+
+def agrupar_batches(codigos_setup, pesos, meta):
+    # Um batch é cada sequência contínua de lotes com o mesmo código de SETUP
+    inicio_batch = np.r_[True, codigos_setup[1:] != codigos_setup[:-1]]
+    id_batch = np.cumsum(inicio_batch) - 1
+    batch_pesos = np.bincount(id_batch, weights=pesos)
+    return codigos_setup[inicio_batch], batch_pesos, batch_pesos >= meta
 
 def otimizar_sequencia(df_lotes, priorities):
     p1, p2, p3 = priorities
     df_lotes_sorted = df_lotes.sort_values(by=[p1, p2, p3, 'DATA_ENTREGA'])
-    sequencia_otimizada_lotes = df_lotes_sorted.to_dict('records')
-    
-    batches_info = []
-    if not sequencia_otimizada_lotes:
-        return [], []
 
-    current_batch_weight = 0
-    current_batch_setup = sequencia_otimizada_lotes[0]['SETUP']
-    
-    for lote in sequencia_otimizada_lotes:
-        if lote['SETUP'] != current_batch_setup:
-            batches_info.append({
-                'setup': current_batch_setup,
-                'peso': current_batch_weight,
-                'atingiu_meta': current_batch_weight >= PESO_META_BATCH
-            })
-            current_batch_setup = lote['SETUP']
-            current_batch_weight = 0
-        current_batch_weight += lote['PESO_TOTAL']
-
-    batches_info.append({
-        'setup': current_batch_setup,
-        'peso': current_batch_weight,
-        'atingiu_meta': current_batch_weight >= PESO_META_BATCH
+    if df_lotes_sorted.empty:
+        return df_lotes_sorted, []
+
+    setups = df_lotes_sorted['SETUP']
+    batch_codigos, batch_pesos, batch_na_meta = agrupar_batches(
+        setups.cat.codes.to_numpy(), df_lotes_sorted['PESO_TOTAL'].to_numpy(dtype=float), PESO_META_BATCH
+    )
+    batch_setups = setups.cat.categories.to_numpy()[batch_codigos]
+
+    batches_info = [
+        {'setup': setup, 'peso': peso, 'atingiu_meta': na_meta}
+        for setup, peso, na_meta in zip(batch_setups, batch_pesos.tolist(), batch_na_meta.tolist())
+    ]
+
+    return df_lotes_sorted, batches_info
+
+def formatar_data_ddmmyyyy(datas):
+    # Mesmo resultado de .dt.strftime('%d/%m/%Y').fillna(''), calculado com aritmética de datetime64
+    valores = datas.to_numpy(dtype='datetime64[D]')
+    if len(valores) == 0:
+        return pd.Series('', index=datas.index, dtype=object)
+    meses = valores.astype('datetime64[M]')
+    ano = valores.astype('datetime64[Y]').astype(np.int64) + 1970
+    mes = meses.astype(np.int64) % 12 + 1
+    dia = (valores - meses).astype(np.int64) + 1
+    texto = np.char.zfill(dia.astype(str), 2)
+    for parte in (np.char.zfill(mes.astype(str), 2), np.char.zfill(ano.astype(str), 4)):
+        texto = np.char.add(np.char.add(texto, '/'), parte)
+    texto[np.isnat(valores)] = ''
+    return pd.Series(texto, index=datas.index)
+
+def gerar_relatorio_final(df_sequencia, df_original):
+    if df_sequencia.empty: return pd.DataFrame()
+    # df_sequencia já vem ordenado e com um lote por linha; LOTE vira categoria comum aos dois lados
+    # para que o merge compare códigos inteiros em vez de textos
+    tipo_lote = pd.CategoricalDtype(df_sequencia['LOTE'])
+    info_lotes = pd.DataFrame({
+        'LOTE': df_sequencia['LOTE'].astype(tipo_lote),
+        'Posição na Sequência': np.arange(1, len(df_sequencia) + 1),
+        'SETUP': df_sequencia['SETUP'],
+        'URGENCIA': df_sequencia['URGENCIA_NOME'],
     })
-        
-    return sequencia_otimizada_lotes, batches_info
-
-def gerar_relatorio_final(sequencia_lotes, df_original):
-    if not sequencia_lotes: return pd.DataFrame()
-    df_sequencia = pd.DataFrame(sequencia_lotes)
-    lotes_ordenados = df_sequencia['LOTE'].unique()
-    mapa_posicao = {lote_id: i + 1 for i, lote_id in enumerate(lotes_ordenados)}
-    mapa_info = df_sequencia.drop_duplicates(subset=['LOTE']).set_index('LOTE')
-    
-    df_final = df_original.copy()
-    
-    df_final['Posição na Sequência'] = df_final['LOTE'].map(mapa_posicao)
-    df_final['SETUP'] = df_final['LOTE'].map(mapa_info['SETUP'])
-    df_final['URGENCIA'] = df_final['LOTE'].map(mapa_info['URGENCIA_NOME'])
-    
-    df_final.dropna(subset=['Posição na Sequência'], inplace=True)
-    df_final['Posição na Sequência'] = df_final['Posição na Sequência'].astype(int)
-    df_final = df_final.sort_values(by='Posição na Sequência')
 
-    df_final['DATA DE ENTREGA'] = df_final['DATA DE ENTREGA'].dt.strftime('%d/%m/%Y').fillna('')
+    # Só as colunas do relatório são levadas adiante, sem copiar a planilha inteira;
+    # o merge interno já descarta as linhas de lotes fora da sequência
+    colunas_mantidas = [c for c in ORDEM_COLUNAS_RELATORIO if c in df_original.columns and c not in COLUNAS_DERIVADAS]
+    df_final = df_original[colunas_mantidas].assign(LOTE=df_original['LOTE'].astype(tipo_lote))
+    df_final = df_final.merge(info_lotes, on='LOTE', how='inner')
+    df_final = df_final.sort_values(by='Posição na Sequência', kind='mergesort')
+
+    df_final['DATA DE ENTREGA'] = formatar_data_ddmmyyyy(df_final['DATA DE ENTREGA'])
     if 'DT PRODUÇÃO' in df_final.columns:
-        df_final['DT PRODUÇÃO'] = pd.to_datetime(df_final['DT PRODUÇÃO'], errors='coerce').dt.strftime('%d/%m/%Y').fillna('')
+        df_final['DT PRODUÇÃO'] = formatar_data_ddmmyyyy(pd.to_datetime(df_final['DT PRODUÇÃO'], errors='coerce'))
     if 'PREVISÃO' in df_final.columns:
-        df_final['PREVISÃO'] = pd.to_datetime(df_final['PREVISÃO'], errors='coerce').dt.strftime('%d/%m/%Y').fillna('')
+        df_final['PREVISÃO'] = formatar_data_ddmmyyyy(pd.to_datetime(df_final['PREVISÃO'], errors='coerce'))
 
-    ordem_final_colunas = [
-        'Posição na Sequência', 'LOTE', 'PC', 'PEDIDO', 'PRODUTO', 'QTDE', 
-        'PREVISÃO', 'OBS.:', 'DT PRODUÇÃO', 'TURNO', 'PESO BOB', 'DATA DE ENTREGA',
-        'SETUP', 'URGENCIA'
-    ]
-    
-    for col in ordem_final_colunas:
+    for col in ORDEM_COLUNAS_RELATORIO:
         if col not in df_final.columns:
             df_final[col] = ''
-    df_relatorio = df_final[ordem_final_colunas]
+    df_relatorio = df_final[ORDEM_COLUNAS_RELATORIO]
     
     return df_relatorio
 
-def calcular_metricas(sequencia_lotes, batches_info):
+def calcular_metricas(df_sequencia, batches_info):
     if not batches_info: return pd.DataFrame(), pd.DataFrame()
     total_mudancas_setup = len(batches_info) - 1 if len(batches_info) > 0 else 0
     num_batches = len(batches_info)
@@ -138,10 +151,15 @@ def calcular_metricas(sequencia_lotes, batches_info):
     peso_total_processado = sum(b['peso'] for b in batches_info)
     peso_medio_batch = peso_total_processado / num_batches if num_batches > 0 else 0
     
-    df_sequencia = pd.DataFrame(sequencia_lotes)
     df_lotes_unicos = df_sequencia.drop_duplicates(subset=['LOTE'])
-    dist_urgencia = df_lotes_unicos['URGENCIA_NOME'].value_counts().reset_index()
+    contagem_urgencia = df_lotes_unicos['URGENCIA_NOME'].value_counts()
+    # Categorias sem nenhum lote não entram na distribuição
+    dist_urgencia = contagem_urgencia[contagem_urgencia > 0].reset_index()
     dist_urgencia.columns = ['Nível de Urgência', 'Qtd. Lotes']
+    # Empates na contagem seguem a ordem dos níveis de urgência
+    dist_urgencia = dist_urgencia.sort_values(
+        ['Qtd. Lotes', 'Nível de Urgência'], ascending=[False, True], kind='mergesort'
+    ).reset_index(drop=True)
     
     metricas = {
         "Total de Lotes Processados": len(df_lotes_unicos),
@@ -155,6 +173,100 @@ def calcular_metricas(sequencia_lotes, batches_info):
     df_metricas = pd.DataFrame(list(metricas.items()), columns=['Métrica', 'Valor'])
     return df_metricas, dist_urgencia
 
+def ler_planilha(arquivo):
+    # Só as colunas usadas no relatório; o cabeçalho é comparado sem espaços nas pontas
+    usecols = lambda col: str(col).strip() in COLUNAS_PLANILHA
+    # calamine (python-calamine) é bem mais rápido; sem ele, volta ao openpyxl em modo somente leitura
+    try:
+        return pd.read_excel(arquivo, sheet_name='Fagor', dtype=str, usecols=usecols, engine='calamine')
+    except ImportError:
+        arquivo.seek(0)
+        return pd.read_excel(arquivo, sheet_name='Fagor', dtype=str, usecols=usecols, engine='openpyxl')
+
+
+def converter_datas(valores):
+    # Serial do Excel só dentro da faixa que o pandas representa; o resto (ex.: 20261010 digitado
+    # como AAAAMMDD) segue para a leitura como texto, como o parser por linha fazia
+    datas_numericas = pd.to_numeric(valores, errors='coerce')
+    serial_valido = datas_numericas.between(0, pd.Timedelta.max.days)
+    datas_excel = pd.to_datetime('1899-12-30') + pd.to_timedelta(datas_numericas.where(serial_valido), 'D')
+    # format='mixed' interpreta cada texto isoladamente
+    datas_texto = pd.to_datetime(valores.where(~serial_valido), dayfirst=True, errors='coerce', format='mixed')
+    return datas_excel.where(serial_valido, datas_texto)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def executar_otimizacao(conteudo_arquivo, priorities, data_referencia):
+    # Memorizado pelo conteúdo do arquivo, pelas prioridades e pela data de referência da urgência;
+    # max_entries limita quantos relatórios ficam guardados em memória
+    # Leitura e processamento dos dados (mesma lógica robusta)
+    df = ler_planilha(io.BytesIO(conteudo_arquivo))
+    df.columns = [str(col).strip() for col in df.columns]
+
+    essential_cols = ['LOTE', 'PRODUTO', 'QTDE']
+    for col in essential_cols:
+        if col not in df.columns:
+            raise ValueError(f"A coluna essencial '{col}' não foi encontrada na planilha.")
+    df.dropna(subset=essential_cols, inplace=True)
+    
+    date_col_name = 'DATA DE ENTREGA'
+    if date_col_name in df.columns:
+        df[date_col_name] = converter_datas(df[date_col_name])
+    else:
+        df[date_col_name] = pd.NaT
+
+    df['QTDE'] = pd.to_numeric(df['QTDE'], errors='coerce').fillna(0)
+    
+    # Execução da lógica de negócio
+    df_lotes = processar_dados_lote(df, data_referencia)
+    sequencia, batches = otimizar_sequencia(df_lotes, priorities)
+    
+    if sequencia.empty:
+        return None, None, None, None
+
+    df_relatorio = gerar_relatorio_final(sequencia, df)
+    df_metricas, df_dist_urgencia = calcular_metricas(sequencia, batches)
+
+    # --- Preparação do arquivo Excel para download ---
+    output = io.BytesIO()
+    # strings_to_urls desligado: evita testar cada texto contra o padrão de URL.
+    # constant_memory não é usado porque o pandas grava as células coluna a coluna.
+    with pd.ExcelWriter(output, engine='xlsxwriter', engine_kwargs={'options': {'strings_to_urls': False}}) as writer:
+        df_relatorio.to_excel(writer, sheet_name='Sequencia_Otimizada', index=False)
+        df_metricas.to_excel(writer, sheet_name='Metricas_Performance', index=False)
+        df_dist_urgencia.to_excel(writer, sheet_name='Distribuicao_Urgencia', index=False)
+        
+        # Aplica a mesma formatação profissional do script original
+        workbook = writer.book
+        header_format = workbook.add_format({
+            'bold': True, 'text_wrap': False, 'valign': 'vcenter',
+            'fg_color': '#4F81BD', 'font_color': 'white', 'border': 1
+        })
+        
+        for sheet_name in writer.sheets:
+            worksheet = writer.sheets[sheet_name]
+            worksheet.set_zoom(63)
+            worksheet.freeze_panes(1, 0)
+            
+            df_to_format = None
+            if sheet_name == 'Sequencia_Otimizada': df_to_format = df_relatorio
+            elif sheet_name == 'Metricas_Performance': df_to_format = df_metricas
+            else: df_to_format = df_dist_urgencia
+            
+            worksheet.write_row(0, 0, list(df_to_format.columns), header_format)
+
+            tamanhos_max = df_to_format.astype(str).agg(lambda coluna: coluna.str.len().max())
+            for i, col in enumerate(df_to_format.columns):
+                max_len = tamanhos_max.iloc[i]
+                col_width = max(0 if pd.isna(max_len) else int(max_len), len(col)) + 2
+                worksheet.set_column(i, i, col_width)
+        
+        # Oculta colunas M e N
+        worksheet_seq = writer.sheets['Sequencia_Otimizada']
+        worksheet_seq.set_column('M:N', None, None, {'hidden': True})
+
+    return output.getvalue(), df_relatorio, df_metricas, df_dist_urgencia
+
 
 # --- INTERFACE GRÁFICA (Streamlit) ---
 
@@ -209,78 +321,13 @@ if uploaded_file:
                 priorities_keys = [p1_selection, p2_selection, p3_selection]
                 priorities = [priority_map[p] for p in priorities_keys]
 
-                # Leitura e processamento dos dados (mesma lógica robusta)
-                df = pd.read_excel(uploaded_file, sheet_name='Fagor', dtype=str)
-                df.columns = [str(col).strip() for col in df.columns]
-
-                essential_cols = ['LOTE', 'PRODUTO', 'QTDE']
-                for col in essential_cols:
-                    if col not in df.columns:
-                        raise ValueError(f"A coluna essencial '{col}' não foi encontrada na planilha.")
-                df.dropna(subset=essential_cols, inplace=True)
-                
-                date_col_name = 'DATA DE ENTREGA'
-                if date_col_name in df.columns:
-                    def robust_date_parser(val):
-                        if pd.isna(val) or val == '': return pd.NaT
-                        try:
-                            excel_date_num = float(val)
-                            return pd.to_datetime('1899-12-30') + pd.to_timedelta(excel_date_num, 'D')
-                        except (ValueError, TypeError):
-                            return pd.to_datetime(val, dayfirst=True, errors='coerce')
-                    df[date_col_name] = df[date_col_name].apply(robust_date_parser)
-                else:
-                    df[date_col_name] = pd.NaT
-
-                df['LOTE'] = df['LOTE'].astype(str)
-                df['QTDE'] = pd.to_numeric(df['QTDE'], errors='coerce').fillna(0)
-                
-                # Execução da lógica de negócio
-                df_lotes = processar_dados_lote(df)
-                sequencia, batches = otimizar_sequencia(df_lotes, priorities)
-                
-                if not sequencia:
+                excel_bytes, df_relatorio, df_metricas, df_dist_urgencia = executar_otimizacao(
+                    uploaded_file.getvalue(), tuple(priorities), DATA_ATUAL
+                )
+
+                if df_relatorio is None:
                     st.error("Nenhum lote válido para processar foi encontrado.")
                 else:
-                    df_relatorio = gerar_relatorio_final(sequencia, df)
-                    df_metricas, df_dist_urgencia = calcular_metricas(sequencia, batches)
-
-                    # --- Preparação do arquivo Excel para download ---
-                    output = io.BytesIO()
-                    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                        df_relatorio.to_excel(writer, sheet_name='Sequencia_Otimizada', index=False)
-                        df_metricas.to_excel(writer, sheet_name='Metricas_Performance', index=False)
-                        df_dist_urgencia.to_excel(writer, sheet_name='Distribuicao_Urgencia', index=False)
-                        
-                        # Aplica a mesma formatação profissional do script original
-                        workbook = writer.book
-                        header_format = workbook.add_format({
-                            'bold': True, 'text_wrap': False, 'valign': 'vcenter',
-                            'fg_color': '#4F81BD', 'font_color': 'white', 'border': 1
-                        })
-                        
-                        for sheet_name in writer.sheets:
-                            worksheet = writer.sheets[sheet_name]
-                            worksheet.set_zoom(63)
-                            worksheet.freeze_panes(1, 0)
-                            
-                            df_to_format = None
-                            if sheet_name == 'Sequencia_Otimizada': df_to_format = df_relatorio
-                            elif sheet_name == 'Metricas_Performance': df_to_format = df_metricas
-                            else: df_to_format = df_dist_urgencia
-                            
-                            for col_num, value in enumerate(df_to_format.columns.values):
-                                worksheet.write(0, col_num, value, header_format)
-                            
-                            for i, col in enumerate(df_to_format.columns):
-                                max_len = df_to_format[col].astype(str).map(len).max()
-                                col_width = max(max_len, len(col)) + 2
-                                worksheet.set_column(i, i, col_width)
-                        
-                        # Oculta colunas M e N
-                        worksheet_seq = writer.sheets['Sequencia_Otimizada']
-                        worksheet_seq.set_column('M:N', None, None, {'hidden': True})
-
                     # Disponibiliza o arquivo para download
                     st.success("Programação otimizada gerada com sucesso!")
                     
@@ -289,7 +336,7 @@ if uploaded_file:
                     
                     st.download_button(
                         label="Clique aqui para baixar o relatório completo em Excel",
-                        data=output.getvalue(),
+                        data=excel_bytes,
                         file_name="programacao_otimizada.xlsx",
                         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                     )
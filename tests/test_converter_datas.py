@@ -0,0 +1,16 @@
+import importlib.util
+from pathlib import Path
+
+import pandas as pd
+
+CAMINHO_APP = Path(__file__).resolve().parent.parent / 'otimizador_programacaoSL.py'
+spec = importlib.util.spec_from_file_location('otimizador_programacaoSL', CAMINHO_APP)
+app = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(app)
+
+
+def test_aaaammdd_fora_da_faixa_do_serial_e_lido_como_texto():
+    # 20261010 não cabe como serial do Excel e não pode derrubar a coluna inteira
+    datas = app.converter_datas(pd.Series(['20261010', '46000.5', None], dtype=str))
+    assert datas.tolist()[:2] == [pd.Timestamp('2026-10-10'), pd.Timestamp('2025-12-09 12:00')]
+    assert pd.isna(datas.iloc[2])